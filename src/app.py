@@ -1,6 +1,7 @@
 import streamlit as st
 import os
 import sys
+import threading
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -13,6 +14,7 @@ from src.tokenizer.manager import TokenizerManager
 from src.ui.modes.single import render_single_mode
 from src.ui.modes.chat import render_chat_mode
 from src.ui.modes.jsonl import render_jsonl_mode
+from src.ui.components import inject_chip_css
 
 
 st.set_page_config(
@@ -22,6 +24,24 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+@st.cache_resource(show_spinner=False)
+def get_tokenizer_manager() -> TokenizerManager:
+    """
+    Returns the tokenizer manager shared by all sessions; the tokenizers are cached in it.
+    """
+    return TokenizerManager.get_instance()
+
+def _warm_tokenizers(manager: TokenizerManager, model_names: list[str]):
+    """
+    Loads tiktoken encodings in the background so the first render doesn't block on them.
+    """
+    for name in model_names:
+        try:
+            manager.get_tokenizer(name, "tiktoken")
+        except Exception:
+            # Errors will surface when the tokenizer is actually used
+            pass
+
 def main():
     st.title("✂️ Tokenizer Visualizer")
 
@@ -116,7 +136,15 @@ def main():
         st.caption("Powered by `tiktoken` & `transformers`")
 
     # --- Main Content ---
-    manager = TokenizerManager.get_instance()
+    # Chip styles are shared by every tokenizer result rendered below
+    inject_chip_css()
+    
+    manager = get_tokenizer_manager()
+    
+    # Preload tiktoken encodings once per session
+    if not st.session_state.get("_warmed"):
+        st.session_state["_warmed"] = True
+        threading.Thread(target=_warm_tokenizers, args=(manager, tiktoken_options), daemon=True).start()
     
     try:
         if mode == "Single Prompt":
@@ -1,9 +1,11 @@
 from abc import ABC, abstractmethod
 from typing import List, Dict, Any, Optional, Union
+import numpy as np
 import tiktoken
-from transformers import AutoTokenizer
 import os
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 class TokenGroup:
     def __init__(self, text: str, tokens: List[str], ids: List[int]):
@@ -31,6 +33,10 @@ class TokenizerWrapper(ABC):
     def encode(self, text: str) -> TokenizationResult:
         pass
 
+    @abstractmethod
+    def encode_batch(self, texts: List[str]) -> List[TokenizationResult]:
+        pass
+
     @abstractmethod
     def decode(self, ids: List[int]) -> str:
         pass
@@ -40,21 +46,14 @@ class TokenizerWrapper(ABC):
     def name(self) -> str:
         pass
 
-def _build_byte_to_char_map(text: str) -> Dict[int, int]:
+def _build_char_start_bytes(text: str) -> np.ndarray:
     """
-    Builds a map where key is the byte index and value is the character index.
+    Returns the UTF-8 byte offset at which each character of the text starts.
     This is needed for Tiktoken to map byte offsets back to character indices.
     """
-    byte_map = {}
-    byte_idx = 0
-    for char_idx, char in enumerate(text):
-        char_bytes = char.encode('utf-8')
-        for _ in char_bytes:
-            byte_map[byte_idx] = char_idx
-            byte_idx += 1
-    # Add a sentinel for the end
-    byte_map[byte_idx] = len(text)
-    return byte_map
+    buf = np.frombuffer(text.encode('utf-8'), dtype=np.uint8)
+    # Every byte that is not a UTF-8 continuation byte (0b10xxxxxx) starts a new character
+    return np.flatnonzero((buf & 0xC0) != 0x80)
 
 def _group_tokens(tokens: List[str], ids: List[int], offsets: List[tuple[int, int]]) -> List[TokenGroup]:
     """
@@ -63,33 +62,23 @@ def _group_tokens(tokens: List[str], ids: List[int], offsets: List[tuple[int, in
     if not tokens:
         return []
 
-    groups = []
-    current_tokens = []
-    current_ids = []
-    current_range = None
-
-    for token, token_id, offset in zip(tokens, ids, offsets):
-        # If this is the first token or matches the current group's range
-        if current_range is None:
-            current_tokens.append(token)
-            current_ids.append(token_id)
-            current_range = offset
-        elif offset == current_range:
-            current_tokens.append(token)
-            current_ids.append(token_id)
-        else:
-            # Group changed, process previous group
-            # Use the text from the first token as the group text (they are all the same char)
-            groups.append(TokenGroup(current_tokens[0], current_tokens, current_ids))
-            
-            # Start new group
-            current_tokens = [token]
-            current_ids = [token_id]
-            current_range = offset
+    n = len(tokens)
+    offsets_arr = np.asarray(offsets, dtype=np.int32).reshape(n, 2)
+    
+    # A new group starts wherever the character range differs from the previous token's
+    change = np.any(offsets_arr[1:] != offsets_arr[:-1], axis=1)
+    
+    # Fast path: no character is split across tokens (common for non-CJK text)
+    if change.all():
+        return [TokenGroup(token, [token], [token_id]) for token, token_id in zip(tokens, ids)]
+    
+    boundaries = np.concatenate(([0], np.nonzero(change)[0] + 1, [n])).tolist()
 
-    # Process final group
-    if current_tokens:
-        groups.append(TokenGroup(current_tokens[0], current_tokens, current_ids))
+    groups = []
+    for start, end in zip(boundaries[:-1], boundaries[1:]):
+        group_tokens = tokens[start:end]
+        # Use the text from the first token as the group text (they are all the same char)
+        groups.append(TokenGroup(group_tokens[0], group_tokens, ids[start:end]))
 
     return groups
 
@@ -104,33 +93,35 @@ class TiktokenWrapper(TokenizerWrapper):
 
     def encode(self, text: str) -> TokenizationResult:
         ids = self.encoder.encode(text)
+        return self._build_result(text, ids)
+
+    def encode_batch(self, texts: List[str]) -> List[TokenizationResult]:
+        # tiktoken releases the GIL and encodes the batch on a thread pool
+        batch_ids = self.encoder.encode_batch(texts, num_threads=os.cpu_count() or 1)
+        return [self._build_result(text, ids) for text, ids in zip(texts, batch_ids)]
+
+    def _build_result(self, text: str, ids: List[int]) -> TokenizationResult:
+        # Byte offset of each character for accurate offset tracking
+        char_starts = _build_char_start_bytes(text)
         
-        raw_tokens = []
-        offsets = []
+        # Raw bytes of every token (tiktoken still looks them up one token at a time)
+        byte_tokens = self.encoder.decode_tokens_bytes(ids)
         
-        # Build byte to char map for accurate offset tracking
-        byte_to_char = _build_byte_to_char_map(text)
-        current_byte_idx = 0
+        # Byte range of each token from the cumulative token lengths
+        lens = np.fromiter((len(b) for b in byte_tokens), dtype=np.int64, count=len(byte_tokens))
+        end_bytes = np.cumsum(lens)
+        start_bytes = end_bytes - lens
         
-        # Use decode_single_token_bytes to get the raw bytes for each token
-        byte_tokens = [self.encoder.decode_single_token_bytes(token) for token in ids]
+        # Map byte ranges to character ranges in one search:
+        # the character containing byte b is searchsorted(char_starts, b, "right") - 1,
+        # so the token's first char is that of start_byte and its end is one past that of end_byte - 1
+        n = len(ids)
+        chars = np.searchsorted(char_starts, np.concatenate((start_bytes, end_bytes - 1)), side="right")
+        start_chars = (chars[:n] - 1).tolist()
+        end_chars = chars[n:].tolist()
         
-        for b_token in byte_tokens:
-            token_len_bytes = len(b_token)
-            start_byte = current_byte_idx
-            end_byte = current_byte_idx + token_len_bytes
-            
-            # Map byte range to character range
-            start_char = byte_to_char.get(start_byte, len(text))
-            end_char_inclusive = byte_to_char.get(end_byte - 1, len(text))
-            end_char = end_char_inclusive + 1
-            
-            token_str = text[start_char:end_char]
-            
-            raw_tokens.append(token_str)
-            offsets.append((start_char, end_char))
-            
-            current_byte_idx = end_byte
+        offsets = list(zip(start_chars, end_chars))
+        raw_tokens = [text[start:end] for start, end in offsets]
             
         # Group tokens
         grouped_tokens = _group_tokens(raw_tokens, ids, offsets)
@@ -160,13 +151,22 @@ def get_bytes_to_unicode_map():
     cs = [chr(n) for n in cs]
     return dict(zip(bs, cs))
 
+# The map is a constant, so build it (and its inverse) once at import
+_BYTES_TO_UNICODE = get_bytes_to_unicode_map()
+_BYTE_DECODER = {v: k for k, v in _BYTES_TO_UNICODE.items()}
+
+# Byte-level detection results keyed by (pre_tokenizer type, decoder type)
+_BYTE_LEVEL_CACHE: Dict[tuple, bool] = {}
+
 class HuggingFaceWrapper(TokenizerWrapper):
     def __init__(self, model_name_or_path: str):
         self.model_name = model_name_or_path
         
+        # Imported lazily: transformers is slow to import and only needed for HF tokenizers
+        from transformers import AutoTokenizer, PreTrainedTokenizerFast
+        
         # Check if it's a local file (likely tokenizer.json)
         if os.path.isfile(model_name_or_path) and model_name_or_path.endswith(".json"):
-            from transformers import PreTrainedTokenizerFast
             # Load directly from the JSON file
             self.tokenizer = PreTrainedTokenizerFast(tokenizer_file=model_name_or_path)
         elif os.path.isdir(model_name_or_path):
@@ -178,7 +178,6 @@ class HuggingFaceWrapper(TokenizerWrapper):
                  # This handles cases where config.json is missing or doesn't have model_type
                  tokenizer_json = os.path.join(model_name_or_path, "tokenizer.json")
                  if os.path.exists(tokenizer_json):
-                     from transformers import PreTrainedTokenizerFast
                      self.tokenizer = PreTrainedTokenizerFast(tokenizer_file=tokenizer_json)
                  else:
                      raise
@@ -190,11 +189,7 @@ class HuggingFaceWrapper(TokenizerWrapper):
         self.is_byte_level = self._is_byte_level_bpe()
         
         # Initialize byte decoder map for GPT-2 style models (only if ByteLevelBPE)
-        if self.is_byte_level:
-            byte_encoder = get_bytes_to_unicode_map()
-            self.byte_decoder = {v: k for k, v in byte_encoder.items()}
-        else:
-            self.byte_decoder = {}
+        self.byte_decoder = _BYTE_DECODER if self.is_byte_level else {}
     
     def _is_byte_level_bpe(self) -> bool:
         """Check if the tokenizer uses ByteLevelBPE (like GPT-2/RoBERTa)."""
@@ -202,25 +197,36 @@ class HuggingFaceWrapper(TokenizerWrapper):
         if hasattr(self.tokenizer, 'backend_tokenizer'):
             bt = self.tokenizer.backend_tokenizer
             if hasattr(bt, 'model'):
-                model_type_str = str(type(bt.model))
                 # ByteLevelBPE appears as 'tokenizers.models.BPE' with a byte_level processor
                 # Standard BPE also appears as 'tokenizers.models.BPE'
                 # We need to check for byte_level in the pre_tokenizer or decoder
-                if hasattr(bt, 'pre_tokenizer'):
-                    pre_tok_str = str(type(bt.pre_tokenizer))
-                    if 'ByteLevel' in pre_tok_str:
-                        return True
-                if hasattr(bt, 'decoder'):
-                    decoder_str = str(type(bt.decoder))
-                    if 'ByteLevel' in decoder_str:
-                        return True
+                pre_tok_type = type(getattr(bt, 'pre_tokenizer', None))
+                decoder_type = type(getattr(bt, 'decoder', None))
+                # The answer only depends on these component types, not on the tokenizer class
+                # (PreTrainedTokenizerFast wraps both byte-level and other backends)
+                cache_key = (pre_tok_type, decoder_type)
+                is_byte_level = _BYTE_LEVEL_CACHE.get(cache_key)
+                if is_byte_level is None:
+                    is_byte_level = 'ByteLevel' in str(pre_tok_type) or 'ByteLevel' in str(decoder_type)
+                    _BYTE_LEVEL_CACHE[cache_key] = is_byte_level
+                return is_byte_level
         return False
 
     def encode(self, text: str) -> TokenizationResult:
         encoding = self.tokenizer(text, return_offsets_mapping=True, add_special_tokens=False)
-        ids = encoding.input_ids
-        offsets = encoding.offset_mapping
-        
+        return self._build_result(text, encoding.input_ids, encoding.offset_mapping)
+
+    def encode_batch(self, texts: List[str]) -> List[TokenizationResult]:
+        if not texts:
+            return []
+        # Fast tokenizers encode the whole batch in Rust (in parallel)
+        encoding = self.tokenizer(texts, return_offsets_mapping=True, add_special_tokens=False)
+        return [
+            self._build_result(text, ids, offsets)
+            for text, ids, offsets in zip(texts, encoding.input_ids, encoding.offset_mapping)
+        ]
+
+    def _build_result(self, text: str, ids: List[int], offsets: List[tuple[int, int]]) -> TokenizationResult:
         raw_tokens = []
         for i, (start, end) in enumerate(offsets):
             # Use the offsets to get the source text
@@ -253,11 +259,29 @@ class HuggingFaceWrapper(TokenizerWrapper):
     def name(self) -> str:
         return f"HF ({os.path.basename(self.model_name)})"
 
+def _build_tokenizer(source: str, model_name: str) -> TokenizerWrapper:
+    """
+    Constructs a tokenizer wrapper for the given source.
+    """
+    if source == "tiktoken":
+        return TiktokenWrapper(model_name)
+    elif source == "huggingface":
+        return HuggingFaceWrapper(model_name)
+    elif source == "local":
+        # For local, model_name is the path
+        return HuggingFaceWrapper(model_name)
+    else:
+        raise ValueError(f"Unknown source: {source}")
+
 class TokenizerManager:
     _instance = None
     
     def __init__(self):
         self._cache: Dict[str, TokenizerWrapper] = {}
+        # Serializes loading, so concurrent sessions don't load the same tokenizer twice
+        self._lock = threading.Lock()
+        self._shards: Dict[str, List[TokenizerWrapper]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
 
     @classmethod
     def get_instance(cls):
@@ -270,18 +294,58 @@ class TokenizerManager:
         if key in self._cache:
             return self._cache[key]
 
-        if source == "tiktoken":
-            wrapper = TiktokenWrapper(model_name)
-        elif source == "huggingface":
-            wrapper = HuggingFaceWrapper(model_name)
-        elif source == "local":
-             # For local, model_name is the path
-             wrapper = HuggingFaceWrapper(model_name)
-        else:
-            raise ValueError(f"Unknown source: {source}")
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = _build_tokenizer(source, model_name)
+            return self._cache[key]
+
+    def get_tokenizer_shards(self, model_name: str, source: str, n: int) -> List[TokenizerWrapper]:
+        """
+        Returns up to n tokenizers that can be used concurrently from separate threads.
+        Hugging Face tokenizers get one independent instance per shard (loaded from the
+        local cache), which scales better than a single batched call on many cores.
+        Tiktoken is not sharded: its encode_batch already spreads a batch over all cores,
+        so only the shared instance is returned.
+        """
+        wrapper = self.get_tokenizer(model_name, source)
+        if not isinstance(wrapper, HuggingFaceWrapper):
+            return [wrapper]
+
+        key = f"{source}:{model_name}"
+        shards = self._shards.setdefault(key, [wrapper])
+        while len(shards) < n:
+            shards.append(HuggingFaceWrapper(model_name))
+        return shards[:n]
+
+    def encode_grid(self, pairs: List[tuple[dict, str]]) -> Dict[tuple[tuple[str, str], str], TokenizationResult]:
+        """
+        Encodes (model_info, text) pairs with one encode_batch call per distinct model.
+        Returns {((model_name, source), text): result}.
+        Hugging Face batches run on a thread pool (batch encoding releases the GIL),
+        so different models encode concurrently with their shared cached tokenizers.
+        Other tokenizers are encoded in the calling thread.
+        """
+        # Distinct texts per model, in first-seen order
+        texts_by_model: Dict[tuple[str, str], Dict[str, None]] = {}
+        for model_info, text in pairs:
+            texts_by_model.setdefault((model_info["name"], model_info["source"]), {})[text] = None
+
+        grid = {}
+        pending = []
+        for model_key, texts in texts_by_model.items():
+            texts = list(texts)
+            tokenizer = self.get_tokenizer(*model_key)
+            if isinstance(tokenizer, HuggingFaceWrapper):
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="tokenizer")
+                future = self._executor.submit(tokenizer.encode_batch, texts)
+                pending.append((model_key, texts, future))
+            else:
+                grid.update(((model_key, text), result) for text, result in zip(texts, tokenizer.encode_batch(texts)))
 
-        self._cache[key] = wrapper
-        return wrapper
+        for model_key, texts, future in pending:
+            grid.update(((model_key, text), result) for text, result in zip(texts, future.result()))
+        return grid
 
     def load_local_tokenizer(self, path: str) -> TokenizerWrapper:
         """Loads a tokenizer from a local directory."""
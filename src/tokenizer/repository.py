@@ -1,9 +1,12 @@
 import os
 import shutil
-from typing import List, Dict
-from transformers import AutoTokenizer
+from typing import List, Dict, Tuple
 
 class TokenizerRepository:
+    # Scan results shared across instances (Streamlit creates one per rerun),
+    # keyed by directory pair and validated against the directories' mtimes.
+    _models_cache: Dict[Tuple[str, str], Tuple[Tuple[int, int], Dict[str, str]]] = {}
+
     def __init__(self, base_dir: str):
         self.base_dir = base_dir
         self.hf_dir = os.path.join(base_dir, "huggingface")
@@ -12,10 +15,33 @@ class TokenizerRepository:
         os.makedirs(self.hf_dir, exist_ok=True)
         os.makedirs(self.uploads_dir, exist_ok=True)
 
+    def _get_mtimes(self) -> Tuple[int, int]:
+        mtimes = []
+        for path in (self.hf_dir, self.uploads_dir):
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except FileNotFoundError:
+                mtimes.append(0)
+        return tuple(mtimes)
+
+    def _invalidate_models_cache(self):
+        """Touches the model directories so the next scan sees a new mtime."""
+        for path in (self.hf_dir, self.uploads_dir):
+            if os.path.exists(path):
+                os.utime(path)
+        self._models_cache.pop((self.hf_dir, self.uploads_dir), None)
+
     def get_available_models(self) -> Dict[str, str]:
         """
         Returns a dictionary of {display_name: path} for all available models.
+        The directory scan is cached until one of the model directories changes.
         """
+        cache_key = (self.hf_dir, self.uploads_dir)
+        mtimes = self._get_mtimes()
+        cached = self._models_cache.get(cache_key)
+        if cached is not None and cached[0] == mtimes:
+            return dict(cached[1])
+
         models = {}
         
         # 1. Scan Hugging Face downloads
@@ -40,14 +66,17 @@ class TokenizerRepository:
                 # Support directory-based models (new standard)
                 elif os.path.isdir(full_path):
                     models[f"Local Dir: {item}"] = full_path
-                    
-        return models
+
+        self._models_cache[cache_key] = (mtimes, models)
+        return dict(models)
 
     def download_model(self, repo_id: str) -> str:
         """
         Downloads a tokenizer from Hugging Face and saves it locally.
         Returns the path to the saved model.
         """
+        # Imported lazily: transformers is slow to import and only needed here
+        from transformers import AutoTokenizer
         try:
             tokenizer = AutoTokenizer.from_pretrained(repo_id)
             
@@ -56,6 +85,7 @@ class TokenizerRepository:
             save_path = os.path.join(self.hf_dir, safe_name)
             
             tokenizer.save_pretrained(save_path)
+            self._invalidate_models_cache()
             return save_path
         except Exception as e:
             raise RuntimeError(f"Failed to download model '{repo_id}': {e}")
@@ -76,8 +106,11 @@ class TokenizerRepository:
         for uploaded_file in files:
             file_path = os.path.join(save_dir, uploaded_file.name)
             with open(file_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-                
+                # Stream in chunks instead of materializing the whole file in memory
+                uploaded_file.seek(0)
+                shutil.copyfileobj(uploaded_file, f, length=1024 * 1024)
+
+        self._invalidate_models_cache()
         return save_dir
 
     def save_uploaded_model(self, file_obj, filename: str) -> str:
@@ -87,5 +120,7 @@ class TokenizerRepository:
         """
         save_path = os.path.join(self.uploads_dir, filename)
         with open(save_path, "wb") as f:
-            f.write(file_obj.getbuffer())
+            file_obj.seek(0)
+            shutil.copyfileobj(file_obj, f, length=1024 * 1024)
+        self._invalidate_models_cache()
         return save_path
@@ -1,5 +1,7 @@
-import hashlib
+import functools
+import zlib
 
+@functools.lru_cache(maxsize=8192)
 def string_to_color(text: str, saturation: int = 70, lightness: int = 80) -> str:
     """
     Generates a consistent HSL color string for a given text.
@@ -12,12 +14,9 @@ def string_to_color(text: str, saturation: int = 70, lightness: int = 80) -> str
     Returns:
         A CSS HSL color string (e.g., "hsl(120, 70%, 80%)").
     """
-    # Use MD5 to get a consistent hash
-    hash_object = hashlib.md5(text.encode())
-    hash_hex = hash_object.hexdigest()
-    
-    # Take the first few bytes to determine hue (0-360)
-    hue = int(hash_hex[:4], 16) % 360
+    # Use CRC32 to get a hash that is consistent across processes
+    # (the built-in hash() is randomized per process)
+    hue = zlib.crc32(text.encode()) % 360
     
     return f"hsl({hue}, {saturation}%, {lightness}%)"
 
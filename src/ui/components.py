@@ -2,13 +2,8 @@ import streamlit as st
 import html
 from src.tokenizer.utils import string_to_color
 
-def render_token_chips(grouped_tokens: list, tokenizer_manager=None):
-    """
-    Renders tokens as colored chips using HTML/CSS.
-    Accepts grouped_tokens (list of TokenGroup objects).
-    """
-    # CSS for the chips
-    css = """
+# CSS for the chips
+_CHIPS_CSS = """
     <style>
     .token-container {
         display: flex;
@@ -103,23 +98,43 @@ def render_token_chips(grouped_tokens: list, tokenizer_manager=None):
         padding: 2px 0;
     }
     </style>
+    """.replace('\n', '')  # We strip newlines to prevent Markdown issues
+
+# Escapes a token for display in a chip in a single pass (newlines are shown as ↵)
+_ESCAPE_TABLE = str.maketrans({
+    "&": "&amp;",
+    "<": "&lt;",
+    ">": "&gt;",
+    "\"": "&quot;",
+    "\n": "↵",
+})
+
+def inject_chip_css():
+    """
+    Emits the token chip CSS. Call once per script run, before any chips are rendered,
+    instead of sending the same stylesheet with every chip container.
+    """
+    st.markdown(_CHIPS_CSS, unsafe_allow_html=True)
+
+def build_token_chips_html(grouped_tokens: list) -> str:
+    """
+    Builds the HTML for tokens rendered as colored chips.
+    Accepts grouped_tokens (list of TokenGroup objects).
     """
-    
     # Start the container
-    # We strip newlines to prevent Markdown issues
-    html_content = css.replace('\n', '') + '<div class="token-container">'
+    parts = ['<div class="token-container">']
     
-    chips_html = ""
     for group in grouped_tokens:
         if group.is_split:
             summary_text = html.escape(group.text)
             bg_color = string_to_color(group.text)
             
-            content_html = '<div class="token-group-content">'
+            content_parts = ['<div class="token-group-content">']
             for i, (token, tid) in enumerate(zip(group.tokens, group.ids)):
                 safe_token = html.escape(repr(token))
-                content_html += f'<div class="sub-token">Part {i+1}: ID {tid} <code style="background:none;padding:0;color:#d63384;">{safe_token}</code></div>'
-            content_html += '</div>'
+                content_parts.append(f'<div class="sub-token">Part {i+1}: ID {tid} <code style="background:none;padding:0;color:#d63384;">{safe_token}</code></div>')
+            content_parts.append('</div>')
+            content_html = "".join(content_parts)
             
             # Use a wrapper for positioning
             # Note: details[open] with absolute content is a trick.
@@ -127,30 +142,36 @@ def render_token_chips(grouped_tokens: list, tokenizer_manager=None):
             # But if it pushes content, it breaks the grid.
             # Let's try absolute positioning for the dropdown part to act like a tooltip/menu.
             
-            chips_html += f'''
+            parts.append(f'''
             <div class="group-wrapper">
                 <details class="token-group">
                     <summary class="token-summary" style="background-color: {bg_color};" title="{len(group.tokens)} tokens">{summary_text} <span style="opacity:0.6;font-size:0.8em;margin-left:2px;">({len(group.tokens)})</span></summary>
                     {content_html}
                 </details>
             </div>
-            '''.replace('\n', '').strip()
+            '''.replace('\n', '').strip())
         else:
             token = group.tokens[0]
             token_id = group.ids[0]
             
-            safe_token = token.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace("\"", "&quot;")
-            display_token = safe_token.replace("\n", "↵")
-            bg_color = string_to_color(safe_token)
+            display_token = token.translate(_ESCAPE_TABLE)
+            bg_color = string_to_color(display_token)
             
             safe_token_repr = html.escape(repr(token), quote=True)
             safe_title = f"ID: {token_id}&#10;Token: {safe_token_repr}"
             
-            chips_html += f'<span class="token-chip" style="background-color: {bg_color};" title="{safe_title}">{display_token}</span>'
+            parts.append(f'<span class="token-chip" style="background-color: {bg_color};" title="{safe_title}">{display_token}</span>')
         
-    html_content += chips_html + "</div>"
-    
-    st.markdown(html_content, unsafe_allow_html=True)
+    parts.append("</div>")
+    return "".join(parts)
+
+def render_token_chips(grouped_tokens: list, tokenizer_manager=None):
+    """
+    Renders tokens as colored chips using HTML/CSS.
+    Accepts grouped_tokens (list of TokenGroup objects).
+    Relies on inject_chip_css() having been called in the current run.
+    """
+    st.markdown(build_token_chips_html(grouped_tokens), unsafe_allow_html=True)
 
 def render_metrics(token_count: int, text: str, model_max_tokens: int = None):
     """
@@ -182,10 +203,58 @@ def render_metrics(token_count: int, text: str, model_max_tokens: int = None):
         else:
             st.metric(avg_label, f"{count / token_count:.2f}" if token_count > 0 else "0")
 
-def render_tokenizer_result(tokenizer_manager, model_info: dict, text: str, show_header: bool = True):
+class _NotCached(Exception):
+    """Raised by _rendered_result on a cache miss for a pair missing from the given grid."""
+
+@st.cache_data(ttl=3600, max_entries=128, show_spinner=False)
+def _rendered_result(_tokenizer_manager, model_name: str, source: str, text: str, _grid: dict = None) -> tuple[int, str]:
+    """
+    Returns (token_count, chips_html) for one tokenizer and text, cached across reruns.
+    Keyed on (model_name, source, text). Only the small rendered tuple is cached, not the full result.
+    On a cache miss the result is taken from _grid ({((model_name, source), text): result})
+    when given, and _NotCached is raised if the pair is not in it (exceptions are never cached,
+    so _grid={} only checks the cache). Without _grid the text is encoded here.
+    """
+    if _grid is None:
+        result = _tokenizer_manager.get_tokenizer(model_name, source).encode(text)
+    elif ((model_name, source), text) in _grid:
+        result = _grid[((model_name, source), text)]
+    else:
+        raise _NotCached
+    return result.count, build_token_chips_html(result.grouped_tokens)
+
+def encode_results(tokenizer_manager, models_data: list[dict], texts: list[str]) -> dict:
+    """
+    Returns {((model_name, source), text): (token_count, chips_html)} for every model and text.
+    Only the pairs missing from the cache are encoded, with one batch per model.
+    If batch encoding fails, those pairs are left out, and render_tokenizer_result
+    encodes them one by one and reports the error for each tokenizer.
+    """
+    rendered = {}
+    missing = []
+    for text in texts:
+        for model_info in models_data:
+            name, source = model_info["name"], model_info["source"]
+            try:
+                rendered[((name, source), text)] = _rendered_result(tokenizer_manager, name, source, text, _grid={})
+            except _NotCached:
+                missing.append((model_info, text))
+    
+    if missing:
+        try:
+            grid = tokenizer_manager.encode_grid(missing)
+        except Exception:
+            return rendered
+        for model_info, text in missing:
+            name, source = model_info["name"], model_info["source"]
+            rendered[((name, source), text)] = _rendered_result(tokenizer_manager, name, source, text, _grid=grid)
+    return rendered
+
+def render_tokenizer_result(tokenizer_manager, model_info: dict, text: str, show_header: bool = True, rendered: tuple[int, str] = None):
     """
     Renders the tokenization result for a single tokenizer.
     Reusable across Single, Chat, and Comparison modes.
+    If an already rendered (token_count, chips_html) result is given, it is used instead of encoding the text.
     """
     name = model_info["name"]
     source = model_info["source"]
@@ -195,12 +264,40 @@ def render_tokenizer_result(tokenizer_manager, model_info: dict, text: str, show
         st.subheader(display_name)
     
     try:
-        tokenizer = tokenizer_manager.get_tokenizer(name, source)
-        result = tokenizer.encode(text)
+        if rendered is None:
+            rendered = _rendered_result(tokenizer_manager, name, source, text)
+        token_count, chips_html = rendered
         
-        render_metrics(result.count, text)
-        render_token_chips(result.grouped_tokens)
+        render_metrics(token_count, text)
+        st.markdown(chips_html, unsafe_allow_html=True)
         
     except Exception as e:
         st.error(f"Error processing with {name}: {e}")
 
+def _render_single(tokenizer_manager, models_data: list[dict], text: str, rendered: dict):
+    model_info = models_data[0]
+    result = rendered.get(((model_info["name"], model_info["source"]), text))
+    render_tokenizer_result(tokenizer_manager, model_info, text, show_header=False, rendered=result)
+
+def _render_side_by_side(tokenizer_manager, models_data: list[dict], text: str, rendered: dict):
+    cols = st.columns(2)
+    for idx, model_info in enumerate(models_data):
+        with cols[idx]:
+            result = rendered.get(((model_info["name"], model_info["source"]), text))
+            render_tokenizer_result(tokenizer_manager, model_info, text, show_header=True, rendered=result)
+
+def _render_stacked(tokenizer_manager, models_data: list[dict], text: str, rendered: dict):
+    for model_info in models_data:
+        result = rendered.get(((model_info["name"], model_info["source"]), text))
+        render_tokenizer_result(tokenizer_manager, model_info, text, show_header=True, rendered=result)
+        st.markdown("---")
+
+# Layout by number of selected models: single view, side-by-side for 2, stacked for 3+
+_LAYOUT_FNS = {1: _render_single, 2: _render_side_by_side}
+
+def render_tokenizer_results(tokenizer_manager, models_data: list[dict], text: str, rendered: dict = None):
+    """
+    Renders the tokenization results of all selected tokenizers for one text.
+    rendered maps ((model_name, source), text) to (token_count, chips_html) (see encode_results).
+    """
+    _LAYOUT_FNS.get(len(models_data), _render_stacked)(tokenizer_manager, models_data, text, rendered or {})
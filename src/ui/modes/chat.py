@@ -1,6 +1,9 @@
 import streamlit as st
 from src.tokenizer.manager import TokenizerManager
-from src.ui.components import render_tokenizer_result
+from src.ui.components import render_tokenizer_results, encode_results
+
+_ROLES = ("system", "user", "assistant")
+_ROLE_INDEX = {role: i for i, role in enumerate(_ROLES)}
 
 def render_chat_mode(tokenizer_manager: TokenizerManager, models_data: list[dict]):
     st.header("Chat Mode")
@@ -24,15 +27,22 @@ def render_chat_mode(tokenizer_manager: TokenizerManager, models_data: list[dict
         st.session_state.chat_messages = []
         st.rerun()
 
-    updated_messages = []
-    
+    # Encode the (model, message) pairs that are not cached yet up front, one batch per model.
+    # Widget values are already in session state, so read the current contents from there.
+    # Messages whose tokenization is hidden are skipped entirely.
+    contents = [
+        st.session_state.get(f"content_{i}", msg["content"]) if st.session_state.get(f"exp_{i}", True) else ""
+        for i, msg in enumerate(st.session_state.chat_messages)
+    ]
+    rendered = encode_results(tokenizer_manager, models_data, [content for content in contents if content])
+
     for i, msg in enumerate(st.session_state.chat_messages):
         with st.container():
             st.markdown(f"**Message {i+1}**")
             col1, col2 = st.columns([1, 4])
             
             with col1:
-                role = st.selectbox(f"Role ##{i}", ["system", "user", "assistant"], index=["system", "user", "assistant"].index(msg["role"]) if msg["role"] in ["system", "user", "assistant"] else 1, key=f"role_{i}")
+                role = st.selectbox(f"Role ##{i}", _ROLES, index=_ROLE_INDEX.get(msg["role"], 1), key=f"role_{i}")
             
             with col2:
                 content = st.text_area(f"Content ##{i}", value=msg["content"], key=f"content_{i}", height=100)
@@ -40,24 +50,11 @@ def render_chat_mode(tokenizer_manager: TokenizerManager, models_data: list[dict
             # Update state
             msg["role"] = role
             msg["content"] = content
-            updated_messages.append(msg)
-            
-            # Tokenize and visualize
-            if content:
-                with st.expander("Tokenization", expanded=True):
-                    if len(models_data) == 1:
-                        render_tokenizer_result(tokenizer_manager, models_data[0], content, show_header=False)
-                    elif len(models_data) == 2:
-                        cols = st.columns(2)
-                        for idx, model_info in enumerate(models_data):
-                            with cols[idx]:
-                                render_tokenizer_result(tokenizer_manager, model_info, content, show_header=True)
-                    else:
-                        for model_info in models_data:
-                            render_tokenizer_result(tokenizer_manager, model_info, content, show_header=True)
-                            st.markdown("---")
             
+            # Tokenize and visualize (only while shown)
+            show_tokens = st.toggle("Show tokenization", value=True, key=f"exp_{i}")
+            if content and show_tokens:
+                render_tokenizer_results(tokenizer_manager, models_data, content, rendered)
+
             st.markdown("---")
-            
-    st.session_state.chat_messages = updated_messages
 
@@ -1,8 +1,63 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
-import json
+import os
+from concurrent.futures import ThreadPoolExecutor
 from src.tokenizer.manager import TokenizerManager
 from src.ui.components import render_token_chips, render_metrics
+from src.utils.jsonl_parser import read_jsonl, read_jsonl_head, build_full_text, detect_format, detect_format_series, FORMAT_MESSAGES, FORMAT_PROMPT_RESPONSE, FORMAT_TEXT
+
+# Rows per encode_batch call; the progress bar advances after each block
+_BATCH_SIZE = 512
+# Sharding only pays off once loading the extra tokenizers is amortized
+_SHARD_MIN_ROWS = 1000
+_MAX_SHARDS = min(os.cpu_count() or 1, 8)
+
+def _encode_texts(tokenizer_manager: TokenizerManager, model_name: str, source: str, texts: list[str], progress_bar=None) -> list:
+    """
+    Tokenizes all texts in blocks of _BATCH_SIZE, spreading the blocks round-robin
+    across per-thread tokenizer shards for large inputs (Hugging Face only).
+    """
+    blocks = [texts[i:i + _BATCH_SIZE] for i in range(0, len(texts), _BATCH_SIZE)]
+    n = min(_MAX_SHARDS, len(texts) // _SHARD_MIN_ROWS)
+    shards = tokenizer_manager.get_tokenizer_shards(model_name, source, n) if n > 1 else []
+    
+    results = []
+    if len(shards) <= 1:
+        tokenizer = tokenizer_manager.get_tokenizer(model_name, source)
+        for i, block in enumerate(blocks):
+            results.extend(tokenizer.encode_batch(block))
+            if progress_bar is not None:
+                progress_bar.progress((i + 1) / len(blocks))
+        return results
+
+    # One single-threaded executor per shard, so a tokenizer instance is never used concurrently
+    n = len(shards)
+    executors = [ThreadPoolExecutor(max_workers=1) for _ in shards]
+    try:
+        futures = [executors[i % n].submit(shards[i % n].encode_batch, block) for i, block in enumerate(blocks)]
+        for i, future in enumerate(futures):
+            results.extend(future.result())
+            if progress_bar is not None:
+                progress_bar.progress((i + 1) / len(blocks))
+    finally:
+        for executor in executors:
+            executor.shutdown(cancel_futures=True)
+    return results
+
+def _encode_row_texts(tokenizer_manager: TokenizerManager, model_name: str, source: str, row_idx, texts: list[str]) -> list:
+    """
+    Encodes the texts shown for one row in the detailed visualization, reusing the
+    encodings stored when that row was visualized before.
+    """
+    cache = st.session_state.setdefault("jsonl_encoded_cache", {})
+    key = (model_name, source, row_idx)
+    entry = cache.get(key)
+    # The texts are stored alongside so a re-uploaded file never reuses stale results
+    if entry is None or entry[0] != texts:
+        entry = (texts, tokenizer_manager.get_tokenizer(model_name, source).encode_batch(texts))
+        cache[key] = entry
+    return entry[1]
 
 def render_jsonl_mode(tokenizer_manager: TokenizerManager, model_name: str, source: str):
     st.header("JSONL Mode")
@@ -11,73 +66,70 @@ def render_jsonl_mode(tokenizer_manager: TokenizerManager, model_name: str, sour
     
     if uploaded_file:
         try:
-            # Read JSONL
-            df = pd.read_json(uploaded_file, lines=True)
-            st.success(f"Loaded {len(df)} rows.")
-            
-            # Preview
-            with st.expander("Data Preview", expanded=False):
-                st.dataframe(df.head())
-            
             # Row Selection / Filtering
             st.subheader("Row Selection")
             row_mode = st.radio("Selection Mode", ["All Rows", "First N Rows", "Range"], horizontal=True)
             
-            selected_df = df
+            # Read JSONL
             if row_mode == "First N Rows":
-                n = st.number_input("N", min_value=1, max_value=len(df), value=min(10, len(df)))
-                selected_df = df.head(n)
-            elif row_mode == "Range":
+                n = st.number_input("N", min_value=1, value=10)
+                # Only parse the rows that will be processed
+                df = read_jsonl_head(uploaded_file, n)
+                if len(df) < n:
+                    st.success(f"Loaded {len(df)} rows (the file has fewer than the requested {n}).")
+                else:
+                    st.success(f"Loaded first {n} rows.")
+            else:
+                # All Rows and Range still parse the whole upload
+                # (Range needs the total row count for its slider)
+                df = read_jsonl(uploaded_file)
+                st.success(f"Loaded {len(df)} rows.")
+            
+            # Preview (only serialized while shown)
+            if st.toggle("Data Preview", value=False, key="jsonl_show_preview"):
+                st.dataframe(df.head())
+            
+            selected_df = df
+            if row_mode == "Range":
                 start, end = st.slider("Range", 0, len(df), (0, min(10, len(df))))
                 selected_df = df.iloc[start:end]
             
             st.info(f"Processing {len(selected_df)} rows.")
             
             if st.button("Analyze Tokens"):
-                tokenizer = tokenizer_manager.get_tokenizer(model_name, source)
-                
-                results = []
-                total_tokens = 0
-                total_count = 0 # Char or Word count
-                
                 metric_unit = st.session_state.get("metric_unit", "Character")
                 count_label = "Word Count" if metric_unit == "Word" else "Char Count"
                 
                 progress_bar = st.progress(0)
                 
-                for i, (index, row) in enumerate(selected_df.iterrows()):
-                    # Determine text content for summary metrics
-                    full_text = ""
-                    if "text" in row and pd.notna(row["text"]):
-                        full_text = str(row["text"])
-                    elif "prompt" in row and "response" in row and pd.notna(row["prompt"]) and pd.notna(row["response"]):
-                        full_text = str(row["prompt"]) + "\n" + str(row["response"])
-                    elif "messages" in row and isinstance(row["messages"], list):
-                        # Approximate text for messages
-                        full_text = "\n".join([str(m.get("content", "")) for m in row["messages"] if isinstance(m, dict)])
-                    
-                    # If format is unknown, full_text remains empty.
-                    
-                    token_result = tokenizer.encode(full_text)
-                    
-                    if metric_unit == "Word":
-                        current_count = len(full_text.split())
-                    else:
-                        current_count = len(full_text)
-                    
-                    results.append({
-                        "Index": index,
-                        "Text Preview": full_text[:50] + "..." if len(full_text) > 50 else full_text,
-                        "Token Count": token_result.count,
-                        count_label: current_count
-                    })
-                    
-                    total_tokens += token_result.count
-                    total_count += current_count
-                    
-                    progress_bar.progress((i + 1) / len(selected_df))
+                formats = detect_format_series(selected_df)
+                full_text = build_full_text(selected_df, formats)
+                
+                # Char or Word count
+                if metric_unit == "Word":
+                    counts = full_text.str.split().str.len()
+                else:
+                    counts = full_text.str.len()
                 
-                results_df = pd.DataFrame(results)
+                head = full_text.str.slice(0, 50)
+                preview = head.where(full_text.str.len() <= 50, head + "...")
+                
+                # Tokenize all rows in batch
+                token_results = _encode_texts(tokenizer_manager, model_name, source, full_text.tolist(), progress_bar)
+                token_counts = np.fromiter((token_result.count for token_result in token_results), dtype=np.int64, count=len(token_results))
+                
+                # Single columnar construction from plain arrays (no per-row dicts or alignment)
+                results_df = pd.DataFrame({
+                    "Index": selected_df.index.to_numpy(),
+                    "Text Preview": preview.to_numpy(dtype=object),
+                    "Token Count": token_counts,
+                    count_label: counts.to_numpy(dtype=np.int64),
+                })
+                total_tokens = int(token_counts.sum())
+                total_count = int(counts.sum())
+                
+                # Drop encodings of rows visualized for a previous analysis
+                st.session_state.pop("jsonl_encoded_cache", None)
                 
                 # Store in session state
                 st.session_state["jsonl_results"] = results_df
@@ -119,51 +171,52 @@ def render_jsonl_mode(tokenizer_manager: TokenizerManager, model_name: str, sour
                     # Since 'df' might have changed if file was re-uploaded, we should be careful.
                     # But assuming standard flow, 'df' is still valid.
                     if selected_row_idx in df.index:
-                        row_data = df.loc[selected_row_idx]
-                        st.json(row_data.to_dict(), expanded=False)
+                        # Work on a plain dict: raw Python values instead of per-access Series indexing
+                        row_data = df.loc[selected_row_idx].to_dict()
+                        st.json(row_data, expanded=False)
                         
-                        # Re-instantiate tokenizer for visualization (or get from manager)
-                        # Note: We need to ensure we use the same tokenizer as analysis
-                        tokenizer = tokenizer_manager.get_tokenizer(model_name, source)
-
                         # Detect format
-                        from src.utils.jsonl_parser import detect_format, FORMAT_MESSAGES, FORMAT_PROMPT_RESPONSE, FORMAT_TEXT
-                        
                         fmt = detect_format(row_data)
                         
                         # 1. Messages Format
                         if fmt == FORMAT_MESSAGES:
                             st.markdown("### Messages Format Detected")
-                            for msg in row_data["messages"]:
-                                if isinstance(msg, dict) and "role" in msg and "content" in msg:
-                                    role = msg["role"]
-                                    content = msg["content"]
-                                    st.markdown(f"**{role.capitalize()}**")
-                                    
-                                    res = tokenizer.encode(str(content))
-                                    render_metrics(res.count, str(content))
-                                    render_token_chips(res.grouped_tokens)
-                                    st.markdown("---")
+                            # Keys missing from a message are None when read through Arrow
+                            messages = [
+                                msg for msg in row_data["messages"]
+                                if isinstance(msg, dict) and msg.get("role") is not None and msg.get("content") is not None
+                            ]
+                            contents = [str(msg["content"]) for msg in messages]
+                            # Encode all messages of the row in one batch
+                            results = _encode_row_texts(tokenizer_manager, model_name, source, selected_row_idx, contents)
+                            for msg, content, res in zip(messages, contents, results):
+                                role = msg["role"]
+                                st.markdown(f"**{role.capitalize()}**")
+                                
+                                render_metrics(res.count, content)
+                                render_token_chips(res.grouped_tokens)
+                                st.markdown("---")
                                     
                         # 2. Prompt/Response Format
                         elif fmt == FORMAT_PROMPT_RESPONSE:
                             st.markdown("### Prompt/Response Format Detected")
+                            prompt = str(row_data["prompt"])
+                            response = str(row_data["response"])
+                            res_prompt, res_response = _encode_row_texts(tokenizer_manager, model_name, source, selected_row_idx, [prompt, response])
                             
                             st.markdown("**Prompt**")
-                            res_prompt = tokenizer.encode(str(row_data["prompt"]))
-                            render_metrics(res_prompt.count, str(row_data["prompt"]))
+                            render_metrics(res_prompt.count, prompt)
                             render_token_chips(res_prompt.grouped_tokens)
                             
                             st.markdown("**Response**")
-                            res_response = tokenizer.encode(str(row_data["response"]))
-                            render_metrics(res_response.count, str(row_data["response"]))
+                            render_metrics(res_response.count, response)
                             render_token_chips(res_response.grouped_tokens)
                             
                         # 3. Text Format
                         elif fmt == FORMAT_TEXT:
                             st.markdown("### Text Format Detected")
                             content = str(row_data["text"])
-                            res = tokenizer.encode(content)
+                            res, = _encode_row_texts(tokenizer_manager, model_name, source, selected_row_idx, [content])
                             render_metrics(res.count, content)
                             render_token_chips(res.grouped_tokens)
 
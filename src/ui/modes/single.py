@@ -1,6 +1,6 @@
 import streamlit as st
 from src.tokenizer.manager import TokenizerManager
-from src.ui.components import render_tokenizer_result
+from src.ui.components import render_tokenizer_results, encode_results
 
 def render_single_mode(tokenizer_manager: TokenizerManager, models_data: list[dict]):
     st.header("Single Prompt Mode")
@@ -14,22 +14,10 @@ def render_single_mode(tokenizer_manager: TokenizerManager, models_data: list[di
     if text:
         st.markdown("---")
         
+        # Encode the text with every selected model up front (cached pairs are skipped)
+        rendered = encode_results(tokenizer_manager, models_data, [text])
+        
         # Comparison Logic
         if len(models_data) > 1:
             st.subheader("Comparison")
-            
-            # Side-by-side for 2 models
-            if len(models_data) == 2:
-                cols = st.columns(2)
-                for idx, model_info in enumerate(models_data):
-                    with cols[idx]:
-                        render_tokenizer_result(tokenizer_manager, model_info, text)
-            else:
-                # Stacked for 3+
-                for model_info in models_data:
-                    render_tokenizer_result(tokenizer_manager, model_info, text)
-                    st.markdown("---")
-        else:
-            # Single model view
-            render_tokenizer_result(tokenizer_manager, models_data[0], text, show_header=False)
-
+        render_tokenizer_results(tokenizer_manager, models_data, text, rendered)
@@ -1,4 +1,9 @@
+import io
+import json
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.json as pa_json
 from typing import Dict, Any
 
 FORMAT_MESSAGES = "messages"
@@ -6,24 +11,153 @@ FORMAT_PROMPT_RESPONSE = "prompt_response"
 FORMAT_TEXT = "text"
 FORMAT_UNKNOWN = "unknown"
 
+_FORMAT_KEYS = frozenset({"messages", "prompt", "response", "text"})
+
+def _notna(value: Any) -> bool:
+    """
+    Fast scalar NA check (None, NaN, or pd.NA), avoiding pd.notna's dispatch overhead.
+    """
+    # NaN is the only value not equal to itself; pd.NA can't be compared, so check it by identity
+    return value is not None and value is not pd.NA and value == value
+
 def detect_format(row_data: Dict[str, Any]) -> str:
     """
     Detects the format of a JSONL row.
     """
+    # Only look at the keys that matter for format detection
+    keys = _FORMAT_KEYS.intersection(row_data.keys())
+    if not keys:
+        return FORMAT_UNKNOWN
+    
     # 1. Messages Format
-    if "messages" in row_data and isinstance(row_data["messages"], list):
+    if "messages" in keys and isinstance(row_data["messages"], list):
         return FORMAT_MESSAGES
     
     # 2. Prompt/Response Format
     # Check for presence AND non-null values
-    if "prompt" in row_data and "response" in row_data:
+    if "prompt" in keys and "response" in keys:
         # Check if values are not NaN (if using pandas, row_data might have NaNs)
-        if pd.notna(row_data["prompt"]) and pd.notna(row_data["response"]):
+        if _notna(row_data["prompt"]) and _notna(row_data["response"]):
             return FORMAT_PROMPT_RESPONSE
             
     # 3. Text Format
-    if "text" in row_data:
-        if pd.notna(row_data["text"]):
+    if "text" in keys:
+        if _notna(row_data["text"]):
             return FORMAT_TEXT
             
     return FORMAT_UNKNOWN
+
+def detect_format_series(df: pd.DataFrame) -> pd.Series:
+    """
+    Detects the format of every row of a JSONL DataFrame at once.
+    Uses the same precedence as detect_format and returns a categorical Series.
+    """
+    n = len(df)
+    absent = np.zeros(n, dtype=bool)
+    
+    if "messages" in df.columns:
+        # tolist() yields Python lists for both object and Arrow list columns
+        is_messages = np.fromiter((isinstance(v, list) for v in df["messages"].tolist()), dtype=bool, count=n)
+    else:
+        is_messages = absent
+    
+    if "prompt" in df.columns and "response" in df.columns:
+        is_prompt_response = (df["prompt"].notna() & df["response"].notna()).to_numpy(dtype=bool)
+    else:
+        is_prompt_response = absent
+    
+    is_text = df["text"].notna().to_numpy(dtype=bool) if "text" in df.columns else absent
+    
+    formats = np.select(
+        [is_messages, is_prompt_response, is_text],
+        [FORMAT_MESSAGES, FORMAT_PROMPT_RESPONSE, FORMAT_TEXT],
+        default=FORMAT_UNKNOWN,
+    )
+    categories = [FORMAT_MESSAGES, FORMAT_PROMPT_RESPONSE, FORMAT_TEXT, FORMAT_UNKNOWN]
+    return pd.Series(pd.Categorical(formats, categories=categories), index=df.index)
+
+def _has_temporal(data_type: pa.DataType) -> bool:
+    """
+    Checks whether an Arrow type, or any type nested in it (list items, struct fields), is temporal.
+    """
+    if pa.types.is_temporal(data_type):
+        return True
+    return any(_has_temporal(data_type.field(i).type) for i in range(data_type.num_fields))
+
+def read_jsonl(uploaded_file) -> pd.DataFrame:
+    """
+    Reads a JSONL upload into a DataFrame backed by Arrow arrays (contiguous string buffers
+    instead of one Python object per cell). Falls back to pandas' reader for files whose
+    rows Arrow cannot unify into a single schema, and for files where Arrow inferred
+    timestamps: it parses date-like strings (e.g. "2024-01-01") as timestamps, which
+    would change the text that is counted and tokenized.
+    """
+    try:
+        table = pa_json.read_json(uploaded_file)
+        if not any(_has_temporal(field.type) for field in table.schema):
+            return table.to_pandas(types_mapper=pd.ArrowDtype)
+    except Exception:
+        pass
+    uploaded_file.seek(0)
+    return pd.read_json(uploaded_file, lines=True)
+
+def read_jsonl_head(uploaded_file, n: int) -> pd.DataFrame:
+    """
+    Reads only the first n rows of a JSONL upload, line by line,
+    so memory and parse time are bounded by n rather than the file size.
+    """
+    uploaded_file.seek(0)
+    rows = []
+    reader = io.TextIOWrapper(uploaded_file, encoding="utf-8")
+    try:
+        for line in reader:
+            if len(rows) >= n:
+                break
+            if line.strip():
+                rows.append(json.loads(line))
+    finally:
+        # Don't let the wrapper close the uploaded file
+        reader.detach()
+    return pd.DataFrame(rows)
+
+def join_messages(messages: list) -> str:
+    # Approximate text for messages
+    # Arrow fills keys missing from a message with None, so None counts as missing
+    return "\n".join(
+        c if isinstance(c, str) else str(c)
+        for c in (m.get("content") for m in messages if isinstance(m, dict))
+        if c is not None
+    )
+
+def _column_text(column: pd.Series) -> pd.Series:
+    """
+    Converts a column to str, with missing values as "" instead of a placeholder
+    ("<NA>" for Arrow-backed columns, "None" or "nan" for object columns).
+    """
+    return column.astype(str).where(column.notna().to_numpy(), "")
+
+def build_full_text(df: pd.DataFrame, formats: pd.Series = None) -> pd.Series:
+    """
+    Determines the text content of every row for summary metrics, column-wise.
+    Each row uses the format reported by detect_format_series, so only the
+    columns relevant to that format are touched.
+    If the format is unknown, the text is empty.
+    """
+    if formats is None:
+        formats = detect_format_series(df)
+    full_text = pd.Series("", index=df.index, dtype=object)
+    
+    is_messages = (formats == FORMAT_MESSAGES).to_numpy()
+    if is_messages.any():
+        full_text[is_messages] = [join_messages(v) for v in df["messages"][is_messages].tolist()]
+    
+    is_prompt_response = (formats == FORMAT_PROMPT_RESPONSE).to_numpy()
+    if is_prompt_response.any():
+        rows = df[is_prompt_response]
+        full_text[is_prompt_response] = _column_text(rows["prompt"]) + "\n" + _column_text(rows["response"])
+    
+    is_text = (formats == FORMAT_TEXT).to_numpy()
+    if is_text.any():
+        full_text[is_text] = _column_text(df["text"][is_text])
+    
+    return full_text
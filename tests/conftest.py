@@ -14,3 +14,8 @@ print(f"\n[Global] HF_HOME set to: {CACHE_DIR}")
 sys.path.insert(0, os.path.abspath(os.path.join(TEST_DIR, "..")))
 
 
+@pytest.fixture(scope="session")
+def tokenizer_factory():
+    """Returns a loader for tokenizers shared by the whole session (the manager caches them)."""
+    from src.tokenizer.manager import TokenizerManager
+    return TokenizerManager.get_instance().get_tokenizer
@@ -0,0 +1,102 @@
+import io
+import json
+import pandas as pd
+import pytest
+from src.utils.jsonl_parser import read_jsonl, build_full_text, detect_format, detect_format_series, FORMAT_PROMPT_RESPONSE, FORMAT_TEXT
+
+# Define test cases here
+# Format: (rows, expected_formats, expected_texts)
+TEST_CASES = [
+    (
+        # Messages take precedence over prompt/response, which takes precedence over text
+        [
+            {"messages": [{"role": "user", "content": "hi"}], "prompt": "p", "response": "r", "text": "t"},
+            {"prompt": "p", "response": "r", "text": "t"},
+            {"text": "t"}
+        ],
+        ["messages", "prompt_response", "text"],
+        ["hi", "p\nr", "t"]
+    ),
+    (
+        # Null values don't count, so a row falls through to the next format
+        [
+            {"prompt": "p", "response": None, "text": "t"},
+            {"prompt": None, "response": "r", "text": None},
+            {"prompt": "p", "response": "r", "text": None}
+        ],
+        ["text", "unknown", "prompt_response"],
+        ["t", "", "p\nr"]
+    ),
+    (
+        # Missing (or null) message fields are skipped
+        [
+            {"messages": [{"role": "user", "content": "hi"}, {"role": "assistant"}, {"content": "there"}]},
+            {"messages": [{"role": "user", "content": None}]},
+            {"messages": []}
+        ],
+        ["messages", "messages", "messages"],
+        ["hi\nthere", "", ""]
+    ),
+    (
+        # Mixed formats and unknown rows in one file
+        [
+            {"text": "a"},
+            {"prompt": "p", "response": "r"},
+            {"messages": [{"role": "user", "content": "hi"}]},
+            {"other": 1}
+        ],
+        ["text", "prompt_response", "messages", "unknown"],
+        ["a", "p\nr", "hi", ""]
+    ),
+    (
+        # Date-like strings stay text (Arrow would infer timestamps)
+        [
+            {"text": "2024-01-01"},
+            {"prompt": "2024-01-01", "response": "2024-01-02T10:00:00"},
+            {"messages": [{"role": "user", "content": "2024-01-01"}]}
+        ],
+        ["text", "prompt_response", "messages"],
+        ["2024-01-01", "2024-01-01\n2024-01-02T10:00:00", "2024-01-01"]
+    ),
+    (
+        # Non-list messages are not the messages format
+        [
+            {"messages": "not a list", "text": "t"}
+        ],
+        ["text"],
+        ["t"]
+    )
+]
+
+def _load(rows, reader):
+    if reader == "records":
+        return pd.DataFrame(rows)
+    # Usually read by Arrow, which merges all rows (and message structs) into one schema,
+    # filling missing keys with None
+    return read_jsonl(io.BytesIO("\n".join(json.dumps(row) for row in rows).encode("utf-8")))
+
+@pytest.mark.parametrize("reader", ["records", "read_jsonl"])
+@pytest.mark.parametrize("rows, expected_formats, expected_texts", TEST_CASES)
+def test_detect_format_series(reader, rows, expected_formats, expected_texts):
+    df = _load(rows, reader)
+
+    formats = detect_format_series(df)
+
+    assert formats.tolist() == expected_formats
+    # The column-wise detection agrees with the per-row detection
+    assert [detect_format(row) for row in df.to_dict("records")] == expected_formats
+
+@pytest.mark.parametrize("reader", ["records", "read_jsonl"])
+@pytest.mark.parametrize("rows, expected_formats, expected_texts", TEST_CASES)
+def test_build_full_text(reader, rows, expected_formats, expected_texts):
+    df = _load(rows, reader)
+
+    assert build_full_text(df).tolist() == expected_texts
+
+@pytest.mark.parametrize("reader", ["records", "read_jsonl"])
+def test_build_full_text_missing_values(reader):
+    # Formats given explicitly, so rows with missing values are built too
+    df = _load([{"prompt": "p", "response": None, "text": None}, {"prompt": None, "response": "r", "text": "t"}], reader)
+
+    assert build_full_text(df, pd.Series([FORMAT_PROMPT_RESPONSE] * 2, index=df.index)).tolist() == ["p\n", "\nr"]
+    assert build_full_text(df, pd.Series([FORMAT_TEXT] * 2, index=df.index)).tolist() == ["", "t"]
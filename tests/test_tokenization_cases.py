@@ -1,5 +1,6 @@
 import pytest
-from src.tokenizer.manager import TokenizerManager
+import tiktoken
+from src.tokenizer.manager import TiktokenWrapper
 
 # Define test cases here
 # Format: (model_name, source, text, expected_count, expected_tokens, expected_ids)
@@ -39,10 +40,9 @@ TEST_CASES = [
 ]
 
 @pytest.mark.parametrize("model_name, source, text, expected_count, expected_tokens, expected_ids", TEST_CASES)
-def test_specific_tokenization(model_name, source, text, expected_count, expected_tokens, expected_ids):
-    manager = TokenizerManager.get_instance()
+def test_specific_tokenization(tokenizer_factory, model_name, source, text, expected_count, expected_tokens, expected_ids):
     try:
-        tokenizer = manager.get_tokenizer(model_name, source)
+        tokenizer = tokenizer_factory(model_name, source)
     except Exception as e:
         pytest.skip(f"Could not load tokenizer {model_name}: {e}")
 
@@ -55,4 +55,75 @@ def test_specific_tokenization(model_name, source, text, expected_count, expecte
         assert result.tokens == expected_tokens
         
     if expected_ids is not None:
-        assert result.ids == expected_ids
+        assert list(result.ids) == expected_ids
+
+
+# Offline cases: a small in-memory tiktoken encoding, so offsets and grouping are always tested
+# Single bytes plus a few merges; "こ" is merged, the other kana are split into byte tokens
+_TEST_RANKS = {bytes([i]): i for i in range(256)}
+for _merge in [b"He", b"ll", b"llo", b"Hello", b" w", b"or", b"ld", b"orld", b" world", "こ".encode()[:2], "こ".encode()]:
+    _TEST_RANKS[_merge] = len(_TEST_RANKS)
+_TEST_ENCODING = tiktoken.Encoding(
+    "test",
+    pat_str=r"""'s|'t| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+""",
+    mergeable_ranks=_TEST_RANKS,
+    special_tokens={},
+)
+
+# Format: (text, expected_tokens, expected_offsets, expected_groups as (text, ids))
+OFFLINE_CASES = [
+    (
+        "Hello world",
+        ["Hello", " world"],
+        [(0, 5), (5, 11)],
+        [("Hello", [259]), (" world", [264])]
+    ),
+    (
+        "こんにちは",
+        ["こ", "ん", "ん", "ん", "に", "に", "ち", "ち", "は", "は"],
+        [(0, 1), (1, 2), (1, 2), (1, 2), (2, 3), (2, 3), (3, 4), (3, 4), (4, 5), (4, 5)],
+        [("こ", [266]), ("ん", [227, 130, 147]), ("に", [265, 171]), ("ち", [265, 161]), ("は", [265, 175])]
+    ),
+    (
+        "🙂x",
+        ["🙂", "🙂", "🙂", "🙂", "x"],
+        [(0, 1), (0, 1), (0, 1), (0, 1), (1, 2)],
+        [("🙂", [240, 159, 153, 130]), ("x", [120])]
+    ),
+    (
+        "é\n",
+        ["é", "é", "\n"],
+        [(0, 1), (0, 1), (1, 2)],
+        [("é", [195, 169]), ("\n", [10])]
+    ),
+    (
+        "",
+        [],
+        [],
+        []
+    )
+]
+
+@pytest.fixture
+def test_tiktoken(monkeypatch):
+    monkeypatch.setattr(tiktoken, "encoding_for_model", lambda model_name: _TEST_ENCODING)
+    return TiktokenWrapper("test")
+
+@pytest.mark.parametrize("text, expected_tokens, expected_offsets, expected_groups", OFFLINE_CASES)
+def test_tiktoken_offsets_and_groups(test_tiktoken, text, expected_tokens, expected_offsets, expected_groups):
+    result = test_tiktoken.encode(text)
+
+    assert result.tokens == expected_tokens
+    assert result.offsets == expected_offsets
+    assert [(group.text, list(group.ids)) for group in result.grouped_tokens] == expected_groups
+    # Every token belongs to exactly one group, and the groups spell out the text
+    assert [token for group in result.grouped_tokens for token in group.tokens] == expected_tokens
+    assert "".join(group.text for group in result.grouped_tokens) == text
+
+def test_tiktoken_encode_batch_matches_encode(test_tiktoken):
+    texts = [case[0] for case in OFFLINE_CASES]
+    for text, result in zip(texts, test_tiktoken.encode_batch(texts)):
+        expected = test_tiktoken.encode(text)
+        assert list(result.ids) == list(expected.ids)
+        assert result.offsets == expected.offsets
+        assert [(group.text, list(group.ids)) for group in result.grouped_tokens] == [(group.text, list(group.ids)) for group in expected.grouped_tokens]